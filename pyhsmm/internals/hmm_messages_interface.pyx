@@ -53,10 +53,13 @@ def messages_backwards_log(
         ):
     cdef hmmc[floating] ref
     cdef bool hetero = A.ndim == 3
-    cdef floating[:,:,::1] _A = A if hetero else np.expand_dims(A, 0)
+    cdef const floating[:,:,::1] _A = A if hetero else np.expand_dims(A, 0)
+    cdef floating[:,::1] _betal = betal
+    cdef int M = A.shape[1], T = aBl.shape[0]
 
-    ref.messages_backwards_log(
-        hetero, A.shape[1], aBl.shape[0], &_A[0,0,0], &aBl[0,0], &betal[0,0])
+    with nogil:
+        ref.messages_backwards_log(
+            hetero, M, T, <floating*> &_A[0,0,0], &aBl[0,0], &_betal[0,0])
     return betal
 
 def messages_forwards_log(
@@ -67,10 +70,13 @@ def messages_forwards_log(
         ):
     cdef hmmc[floating] ref
     cdef bool hetero = A.ndim == 3
-    cdef floating[:,:,::1] _A = A if hetero else np.expand_dims(A, 0)
-    ref.messages_forwards_log(
-        hetero, A.shape[1], aBl.shape[0], &_A[0,0,0], &pi0[0], &aBl[0,0],
-        &alphal[0,0])
+    cdef const floating[:,:,::1] _A = A if hetero else np.expand_dims(A, 0)
+    cdef floating[:,::1] _alphal = alphal
+    cdef int M = A.shape[1], T = aBl.shape[0]
+
+    with nogil:
+        ref.messages_forwards_log(
+            hetero, M, T, <floating*> &_A[0,0,0], &pi0[0], &aBl[0,0], &_alphal[0,0])
     return alphal
 
 def sample_forwards_log(
@@ -82,7 +88,7 @@ def sample_forwards_log(
         ):
     cdef hmmc[floating] ref
     cdef bool hetero = A.ndim == 3
-    cdef floating[:,:,::1] _A = A if hetero else np.expand_dims(A, 0)
+    cdef const floating[:,:,::1] _A = A if hetero else np.expand_dims(A, 0)
 
     cdef floating[:] randseq
     if floating is double:
@@ -90,9 +96,11 @@ def sample_forwards_log(
     else:
         randseq = np.random.random(size=aBl.shape[0]).astype(np.float)
 
-    ref.sample_forwards_log(
-            hetero, A.shape[1], aBl.shape[0], &_A[0,0,0], &pi0[0], &aBl[0,0],
-            &betal[0,0], &stateseq[0], &randseq[0])
+    cdef int M = A.shape[1], T = aBl.shape[0]
+    with nogil:
+        ref.sample_forwards_log(
+                hetero, M, T, <floating*> &_A[0,0,0], &pi0[0], &aBl[0,0],
+                &betal[0,0], &stateseq[0], &randseq[0])
 
     return np.asarray(stateseq)
 
@@ -107,7 +115,7 @@ def expected_statistics_log(
 
     cdef hmmc[floating] ref
     cdef bool hetero = log_trans_potential.ndim == 3
-    cdef floating[:,:,::1] _A = log_trans_potential if hetero \
+    cdef const floating[:,:,::1] _A = log_trans_potential if hetero \
         else np.expand_dims(log_trans_potential, 0)
     cdef floating[:,:,::1] _expected_transcounts = \
     	 expected_transcounts if hetero \
@@ -117,7 +125,7 @@ def expected_statistics_log(
     cdef floating log_normalizer = ref.expected_statistics_log(
             hetero,
             log_trans_potential.shape[1], alphal.shape[0],
-            &_A[0,0,0],
+            <floating*> &_A[0,0,0],
             &log_likelihood_potential[0,0],
             &alphal[0,0],
             &betal[0,0],
@@ -133,12 +141,14 @@ def messages_forwards_normalized(
         ):
     cdef hmmc[floating] ref
     cdef bool hetero = A.ndim == 3
-    cdef floating[:,:,::1] _A = A if hetero else np.expand_dims(A, 0)
-
-    cdef floating loglike = \
-        ref.messages_forwards_normalized(
-            hetero, A.shape[1], aBl.shape[0], &_A[0,0,0], &pi0[0],
-            &aBl[0,0], &alphan[0,0])
+    cdef const floating[:,:,::1] _A = A if hetero else np.expand_dims(A, 0)
+    cdef floating[:,::1] _alphan = alphan
+    cdef int M = A.shape[1], T = aBl.shape[0]
+
+    cdef floating loglike
+    with nogil:
+        loglike = ref.messages_forwards_normalized(
+            hetero, M, T, <floating*> &_A[0,0,0], &pi0[0], &aBl[0,0], &_alphan[0,0])
     return alphan, loglike
 
 def sample_backwards_normalized(
@@ -148,7 +158,7 @@ def sample_backwards_normalized(
         ):
     cdef hmmc[floating] ref
     cdef bool hetero = AT.ndim == 3
-    cdef floating[:,:,::1] _AT = AT if hetero else np.expand_dims(AT, 0)
+    cdef const floating[:,:,::1] _AT = AT if hetero else np.expand_dims(AT, 0)
 
     cdef floating[:] randseq
     if floating is double:
@@ -156,20 +166,22 @@ def sample_backwards_normalized(
     else:
         randseq = np.random.random(size=alphan.shape[0]).astype(np.float)
 
-    ref.sample_backwards_normalized(
-        hetero, AT.shape[1], alphan.shape[0], &_AT[0,0,0],
-        &alphan[0,0], &stateseq[0], &randseq[0])
+    cdef int M = AT.shape[1], T = alphan.shape[0]
+    with nogil:
+        ref.sample_backwards_normalized(
+            hetero, M, T, <floating*> &_AT[0,0,0], &alphan[0,0], &stateseq[0], &randseq[0])
 
     return np.asarray(stateseq)
 
 def viterbi(
-        floating[:,::1] A not None,
+        const floating[:,::1] A not None,
         floating[:,::1] aBl not None,
         floating[::1] pi0 not None,
         int32_t[::1] stateseq not None,
         ):
     cdef hmmc[floating] ref
-    ref.viterbi(A.shape[1],aBl.shape[0],&A[0,0],&pi0[0],&aBl[0,0],
-                &stateseq[0])
+    with nogil:
+        ref.viterbi(A.shape[1],aBl.shape[0],<floating*> &A[0,0],&pi0[0],&aBl[0,0],
+                    &stateseq[0])
     return np.asarray(stateseq)
 
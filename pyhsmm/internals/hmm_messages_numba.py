@@ -0,0 +1,50 @@
+from __future__ import division
+import numpy as np
+from numba import njit, prange
+
+# NOTE: these take log transition matrices and log initial distributions so
+# that the kernels never have to take logs themselves
+
+@njit(cache=True)
+def _logsumexp(x):
+    m = x.max()
+    if m == -np.inf:
+        return m
+    return m + np.log(np.sum(np.exp(x - m)))
+
+@njit(parallel=True,cache=True)
+def messages_forwards_log(log_trans,log_pi,aBl):
+    T, N = aBl.shape
+    alphal = np.empty((T,N))
+    alphal[0] = log_pi + aBl[0]
+    for t in range(1,T):
+        for i in prange(N):
+            alphal[t,i] = _logsumexp(alphal[t-1] + log_trans[:,i]) + aBl[t,i]
+    return alphal
+
+@njit(parallel=True,cache=True)
+def messages_backwards_log(log_trans,aBl):
+    T, N = aBl.shape
+    betal = np.empty((T,N))
+    betal[-1] = 0.
+    for t in range(T-2,-1,-1):
+        for i in prange(N):
+            betal[t,i] = _logsumexp(log_trans[i] + betal[t+1] + aBl[t+1])
+    return betal
+
+@njit(parallel=True,cache=True)
+def viterbi(log_trans,log_pi,aBl):
+    T, N = aBl.shape
+    scores = np.zeros((T,N))
+    args = np.zeros((T,N),dtype=np.int32)
+    for t in range(T-2,-1,-1):
+        for i in prange(N):
+            vals = log_trans[i] + scores[t+1] + aBl[t+1]
+            args[t+1,i] = vals.argmax()
+            scores[t,i] = vals.max()
+
+    stateseq = np.empty(T,dtype=np.int32)
+    stateseq[0] = (scores[0] + log_pi + aBl[0]).argmax()
+    for t in range(1,T):
+        stateseq[t] = args[t,stateseq[t-1]]
+    return stateseq
@@ -18,6 +18,36 @@ from pyhsmm.util.general import rle
 #  Mixins and bases  #
 ######################
 
+def _narrow_stateseq(stateseq,num_states):
+    '''
+    returns stateseq in the narrowest unsigned integer dtype that can hold
+    num_states labels, which numpy's stable argsort handles with a radix sort
+    '''
+    # NOTE: states objects keep their stateseqs as int32 because that's what the
+    # compiled message passing code reads and writes, so narrow only for scans
+    for dtype in (np.uint8, np.uint16):
+        if num_states <= np.iinfo(dtype).max + 1:
+            return stateseq.astype(dtype,copy=False)
+    return stateseq
+
+def _sort_by_state(stateseq,num_states):
+    '''
+    returns (order, offsets) such that order[offsets[k]:offsets[k+1]] holds the
+    indices assigned to state k, in increasing order
+    '''
+    counts = np.bincount(stateseq,minlength=num_states)
+    offsets = np.concatenate(((0,),counts.cumsum()))
+    order = np.argsort(_narrow_stateseq(stateseq,num_states),kind='stable')
+    return order, offsets
+
+def _bucket_by_state(stateseq,data,num_states):
+    '''
+    sorts the rows of data by state with one stable argsort, returning the
+    sorted data and offsets delimiting each state's block
+    '''
+    order, offsets = _sort_by_state(stateseq,num_states)
+    return data[order], offsets
+
 class _StatesBase(with_metaclass(abc.ABCMeta, object)):
 
     def __init__(self,model,T=None,data=None,stateseq=None,
@@ -42,6 +72,7 @@ class _StatesBase(with_metaclass(abc.ABCMeta, object)):
                 self.generate_states()
 
     def copy_sample(self,newmodel):
+        # NOTE: samples share self.data by reference; only the stateseq is owned
         new = copy.copy(self)
         new.clear_caches() # saves space, though may recompute later for likelihoods
         new.model = newmodel
@@ -49,6 +80,7 @@ class _StatesBase(with_metaclass(abc.ABCMeta, object)):
         return new
 
     _kwargs = {}  # used in subclasses for joblib stuff
+    _releases_gil = False  # whether resample can run usefully in threads
 
     ### model properties
 
@@ -60,6 +92,10 @@ class _StatesBase(with_metaclass(abc.ABCMeta, object)):
     def trans_matrix(self):
         return self.model.trans_distn.trans_matrix
 
+    @property
+    def log_trans_matrix(self):
+        return self.model.trans_distn.log_trans_matrix
+
     @property
     def pi_0(self):
         return self.model.init_state_distn.pi_0
@@ -92,15 +128,50 @@ class _StatesBase(with_metaclass(abc.ABCMeta, object)):
     def clear_caches(self):
         self._aBl = self._mf_aBl = None
         self._normalizer = None
+        self._state_order = self._state_buckets = None
+
+    # NOTE: stateseq can be reassigned without clearing caches (e.g. by
+    # resample), so the caches below are keyed on the stateseq they came from
+
+    @property
+    def state_order(self):
+        '''
+        returns (order, offsets) such that order[offsets[k]:offsets[k+1]] holds
+        the time indices assigned to state k
+        '''
+        stateseq = self.stateseq
+        if self._state_order is None or self._state_order[0] is not stateseq:
+            self._state_order = (stateseq,) + _sort_by_state(stateseq,self.num_states)
+        return self._state_order[1:]
+
+    @property
+    def state_indices(self):
+        'a list whose kth entry holds the time indices assigned to state k'
+        order, offsets = self.state_order
+        return np.split(order,offsets[1:-1])
+
+    @property
+    def state_buckets(self):
+        '''
+        returns (data_sorted, offsets) so that the data assigned to state k is
+        the contiguous block data_sorted[offsets[k]:offsets[k+1]]
+        '''
+        stateseq = self.stateseq
+        if self._state_buckets is None or self._state_buckets[0] is not stateseq:
+            order, offsets = self.state_order
+            self._state_buckets = (stateseq, self.data[order], offsets)
+        return self._state_buckets[1:]
 
     @property
     def aBl(self):
         if self._aBl is None:
             data = self.data
 
-            aBl = self._aBl = np.empty((data.shape[0],self.num_states))
-            for idx, obs_distn in enumerate(self.obs_distns):
-                aBl[:,idx] = obs_distn.log_likelihood(data).ravel()
+            aBl = self._aBl = self.model._batched_obs_loglik(data)
+            if aBl is None:
+                aBl = self._aBl = np.empty((data.shape[0],self.num_states))
+                for idx, obs_distn in enumerate(self.obs_distns):
+                    aBl[:,idx] = obs_distn.log_likelihood(data).ravel()
             aBl[np.isnan(aBl).any(1)] = 0.
 
         return self._aBl
@@ -125,6 +196,10 @@ class _SeparateTransMixin(object):
     def trans_matrix(self):
         return self.model.trans_distns[self.group_id].trans_matrix
 
+    @property
+    def log_trans_matrix(self):
+        return self.model.trans_distns[self.group_id].log_trans_matrix
+
     @property
     def pi_0(self):
         return self.model.init_state_distns[self.group_id].pi_0
@@ -451,7 +526,10 @@ class HMMStatesPython(_StatesBase):
 
     @all_expected_stats.setter
     def all_expected_stats(self,vals):
-        self.expected_states, self.expected_transcounts, self._normalizer = vals
+        expected_states, self.expected_transcounts, self._normalizer = vals
+        # NOTE: Fortran order makes each state's column (what the obs distns'
+        # weighted updates read) contiguous
+        self.expected_states = np.asfortranarray(expected_states)
         self.stateseq = self.expected_states.argmax(1).astype('int32') # for plotting
 
     def meanfieldupdate(self):
@@ -536,7 +614,6 @@ class HMMStatesPython(_StatesBase):
     ### EM
 
     def E_step(self):
-        self.clear_caches()
         self.all_expected_stats = self._expected_statistics(
                 self.trans_matrix,self.pi_0,self.aBl)
 
@@ -595,6 +672,8 @@ class HMMStatesPython(_StatesBase):
         return stateseq
 
 class HMMStatesEigen(HMMStatesPython):
+    _releases_gil = True
+
     def generate_states(self):
         self.stateseq = sample_markov(
                 T=self.T,
@@ -682,6 +761,65 @@ class HMMStatesEigen(HMMStatesPython):
         self.stateseq = viterbi(self.trans_matrix,self.aBl,self.pi_0,
                 np.empty(self.aBl.shape[0],dtype='int32'))
 
+class HMMStatesNumba(HMMStatesPython):
+    # NOTE: the kernels work on log transition matrices, so the instance methods
+    # hand them the one the transitions object caches; the static methods also
+    # get mean field and other potentials, so they take the logs themselves
+
+    ### common messages (Gibbs, EM, likelihood calculation)
+
+    @staticmethod
+    def _messages_backwards_log(trans_matrix,log_likelihoods):
+        from pyhsmm.internals.hmm_messages_numba import messages_backwards_log
+        with np.errstate(divide='ignore'):
+            log_trans = np.log(trans_matrix)
+        return messages_backwards_log(log_trans,log_likelihoods)
+
+    @staticmethod
+    def _messages_forwards_log(trans_matrix,init_state_distn,log_likelihoods):
+        from pyhsmm.internals.hmm_messages_numba import messages_forwards_log
+        with np.errstate(divide='ignore'):
+            log_trans, log_pi = np.log(trans_matrix), np.log(init_state_distn)
+        # the forward recursion reads columns of the transition matrix
+        return messages_forwards_log(
+                np.asfortranarray(log_trans),log_pi,log_likelihoods)
+
+    def messages_backwards_log(self):
+        from pyhsmm.internals.hmm_messages_numba import messages_backwards_log
+        betal = messages_backwards_log(self.log_trans_matrix,self.aBl)
+        assert not np.isnan(betal).any()
+        with np.errstate(divide='ignore'):
+            self._normalizer = logsumexp(np.log(self.pi_0) + betal[0] + self.aBl[0])
+        return betal
+
+    def messages_forwards_log(self):
+        from pyhsmm.internals.hmm_messages_numba import messages_forwards_log
+        with np.errstate(divide='ignore'):
+            log_pi = np.log(self.pi_0)
+        alphal = messages_forwards_log(
+                np.asfortranarray(self.log_trans_matrix),log_pi,self.aBl)
+        assert not np.any(np.isnan(alphal))
+        self._normalizer = logsumexp(alphal[-1])
+        return alphal
+
+    ### Viterbi
+
+    @staticmethod
+    def _viterbi(trans_matrix,init_state_distn,log_likelihoods):
+        from pyhsmm.internals.hmm_messages_numba import viterbi
+        with np.errstate(divide='ignore'):
+            log_trans, log_pi = np.log(trans_matrix), np.log(init_state_distn)
+        return viterbi(log_trans,log_pi,log_likelihoods)
+
+    def Viterbi(self):
+        from pyhsmm.internals.hmm_messages_numba import viterbi
+        with np.errstate(divide='ignore'):
+            log_pi = np.log(self.pi_0)
+        self.stateseq = viterbi(self.log_trans_matrix,log_pi,self.aBl)
+
+    def mf_Viterbi(self):
+        self.stateseq = self._viterbi(self.mf_trans_matrix,self.mf_pi_0,self.mf_aBl)
+
 class HMMStatesEigenSeparateTrans(_SeparateTransMixin,HMMStatesEigen):
     pass
 
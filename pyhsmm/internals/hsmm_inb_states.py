@@ -152,7 +152,7 @@ class HSMMStatesIntegerNegativeBinomial(_HSMMStatesIntegerNegativeBinomialBase):
     def messages_backwards2(self):
         # this method is just for numerical testing
         # returns HSMM messages using HMM embedding. the way of the future!
-        Al = np.log(self.trans_matrix)
+        Al = self.log_trans_matrix
         T, num_states = self.T, self.num_states
 
         betal = np.zeros((T,num_states))
@@ -27,7 +27,7 @@ cdef extern from "hsmm_messages.h":
             Type *betal, Type *betastarl, int32_t *stateseq, Type *randseq) nogil
 
 def messages_backwards_log(
-        floating[:,::1] A not None,
+        const floating[:,::1] A not None,
         floating[:,::1] aBl not None,
         floating[:,::1] aDl not None,
         floating[:,::1] aDsl not None,
@@ -35,15 +35,17 @@ def messages_backwards_log(
         np.ndarray[floating,ndim=2,mode="c"] betastarl not None,
         int right_censoring, int trunc):
     cdef hsmmc[floating] ref
+    cdef floating[:,::1] _betal = betal, _betastarl = betastarl
 
-    ref.messages_backwards_log(A.shape[0],aBl.shape[0],&A[0,0],
-            &aBl[0,0],&aDl[0,0],&aDsl[0,0],&betal[0,0],&betastarl[0,0],
-            right_censoring,trunc)
+    with nogil:
+        ref.messages_backwards_log(A.shape[0],aBl.shape[0],<floating*> &A[0,0],
+                &aBl[0,0],&aDl[0,0],&aDsl[0,0],&_betal[0,0],&_betastarl[0,0],
+                right_censoring,trunc)
 
     return betal, betastarl
 
 def sample_forwards_log(
-        floating[:,::1] A not None,
+        const floating[:,::1] A not None,
         floating[:,::1] caBl not None,
         floating[:,::1] aDl not None,
         floating[::1] pi0 not None,
@@ -62,13 +64,14 @@ def sample_forwards_log(
     else:
         randseq = np.random.random(size=2*caBl.shape[0]).astype(np.float)
 
-    ref.sample_forwards_log(A.shape[0],caBl.shape[0],&A[0,0],&pi0[0],
-            &caBl[0,0],&aDl[0,0],&betal[0,0],&betastarl[0,0],&stateseq[0],&randseq[0])
+    with nogil:
+        ref.sample_forwards_log(A.shape[0],caBl.shape[0],<floating*> &A[0,0],&pi0[0],
+                &caBl[0,0],&aDl[0,0],&betal[0,0],&betastarl[0,0],&stateseq[0],&randseq[0])
 
     return np.asarray(stateseq)
 
 def resample_log_multiple(
-        floating[:,::1] A not None,
+        const floating[:,::1] A not None,
         floating[::1] pi0 not None,
         floating[:,::1] aDl not None,
         floating[:,::1] aDsl not None,
@@ -121,10 +124,10 @@ def resample_log_multiple(
 
     with nogil:
         for i in prange(num):
-            ref.messages_backwards_log(N,Ts[i],&A[0,0],
+            ref.messages_backwards_log(N,Ts[i],<floating*> &A[0,0],
                     aBls_vect[i],&aDl[0,0],&aDsl[0,0],betals_vect[i],betastarls_vect[i],
                     right_censorings[i],truncs[i])
-            ref.sample_forwards_log(N,Ts[i],&A[0,0],&pi0[0],
+            ref.sample_forwards_log(N,Ts[i],<floating*> &A[0,0],&pi0[0],
                     caBls_vect[i],&aDl[0,0],betals_vect[i],betastarls_vect[i],
                     stateseqs_vect[i],&randseq[starts[i]])
 
@@ -9,7 +9,7 @@ from pyhsmm.util.general import rle, rcumsum, cumsum
 
 from . import hmm_states
 from .hmm_states import _StatesBase, _SeparateTransMixin, \
-    HMMStatesPython, HMMStatesEigen
+    HMMStatesPython, HMMStatesEigen, _sort_by_state
 
 
 class HSMMStatesPython(_StatesBase):
@@ -58,6 +58,17 @@ class HSMMStatesPython(_StatesBase):
             durs[-1] = self.dur_distns[self.stateseq_norep[-1]].rvs_given_greater_than(durs[-1]-1)
         return durs
 
+    @property
+    def state_indices_norep(self):
+        'like state_indices, but indexing into stateseq_norep and the durations'
+        stateseq_norep = self.stateseq_norep
+        if self._state_order_norep is None \
+                or self._state_order_norep[0] is not stateseq_norep:
+            self._state_order_norep = \
+                (stateseq_norep,) + _sort_by_state(stateseq_norep,self.num_states)
+        _, order, offsets = self._state_order_norep
+        return np.split(order,offsets[1:-1])
+
     @property
     def untrunc_slice(self):
         return slice(1 if self.left_censoring else 0, -1 if self.right_censoring else None)
@@ -86,12 +97,6 @@ class HSMMStatesPython(_StatesBase):
     def dur_distns(self):
         return self.model.dur_distns
 
-    @property
-    def log_trans_matrix(self):
-        if self._log_trans_matrix is None:
-            self._log_trans_matrix = np.log(self.trans_matrix)
-        return self._log_trans_matrix
-
 
     @property
     def mf_pi_0(self):
@@ -142,8 +147,9 @@ class HSMMStatesPython(_StatesBase):
         self._aBl = self._mf_aBl = None
         self._aDl = self._mf_aDl = None
         self._aDsl = self._mf_aDsl = None
-        self._log_trans_matrix = self._mf_log_trans_matrix = None
+        self._mf_log_trans_matrix = None
         self._normalizer = None
+        self._state_order_norep = None
         super(HSMMStatesPython,self).clear_caches()
 
     ### array properties for homog model
@@ -362,7 +368,6 @@ class HSMMStatesPython(_StatesBase):
     # these two methods just call _expected_statistics with the right stuff
 
     def E_step(self):
-        self.clear_caches()
         self.all_expected_stats = self._expected_statistics(
                 self.trans_potentials, np.log(self.pi_0),
                 self.cumulative_obs_potentials, self.reverse_cumulative_obs_potentials,
@@ -384,8 +389,9 @@ class HSMMStatesPython(_StatesBase):
 
     @all_expected_stats.setter
     def all_expected_stats(self,vals):
-        self.expected_states, self.expected_transcounts, \
+        expected_states, self.expected_transcounts, \
                 self.expected_durations, self._normalizer = vals
+        self.expected_states = np.asfortranarray(expected_states)  # see HMM states
         self.stateseq = self.expected_states.argmax(1).astype('int32') # for plotting
 
     def init_meanfield_from_sample(self):
@@ -496,6 +502,7 @@ class HSMMStatesPython(_StatesBase):
 class HSMMStatesEigen(HSMMStatesPython):
     # NOTE: the methods in this class only work with iid emissions (i.e. without
     # overriding methods like cumulative_likelihood_block)
+    _releases_gil = True
 
     def messages_backwards(self):
         # NOTE: np.maximum calls are because the C++ code doesn't do
@@ -50,6 +50,7 @@ class UniformInitialState(object):
 class HMMInitialState(Categorical):
     def __init__(self,model,init_state_concentration=None,pi_0=None):
         self.model = model
+        self.clear_caches()
         if init_state_concentration is not None or pi_0 is not None:
             self._is_steady_state = False
             super(HMMInitialState,self).__init__(
@@ -74,10 +75,15 @@ class HMMInitialState(Categorical):
 
     @property
     def steady_state_distribution(self):
-        return top_eigenvector(self.model.trans_distn.trans_matrix)
+        # NOTE: trans_distn hands back the same trans_matrix array until its
+        # parameters change, so the cache is keyed on that array
+        trans_matrix = self.model.trans_distn.trans_matrix
+        if self._steady_state is None or self._steady_state[0] is not trans_matrix:
+            self._steady_state = (trans_matrix, top_eigenvector(trans_matrix))
+        return self._steady_state[1]
 
     def clear_caches(self):
-        pass
+        self._steady_state = None
 
     def meanfieldupdate(self,expected_initial_states_list):
         super(HMMInitialState,self).meanfieldupdate(None,expected_initial_states_list)
@@ -91,7 +97,10 @@ class HMMInitialState(Categorical):
                 data=samples,weights=expected_states_list)
 
     def copy_sample(self, new_model):
-        new = copy.deepcopy(self)
+        # NOTE: a deepcopy would also copy self.model, including all its data
+        new = copy.copy(self)
+        if getattr(self,'weights',None) is not None:
+            new.weights = self.weights.copy()
         new.model = new_model
         return new
 
@@ -117,12 +126,8 @@ class StartInZero(GibbsSampling,MaxLikelihood):
 class HSMMInitialState(HMMInitialState):
     @property
     def steady_state_distribution(self):
-        if self._steady_state_distribution is None:
-            markov_part = super(HSMMSteadyState,self).pi_0
-            duration_expectations = np.array([d.mean for d in self.model.dur_distns])
-            self._steady_state_distribution = markov_part * duration_expectations
-            self._steady_state_distribution /= self._steady_state_distribution.sum()
-        return self._steady_state_distribution
-
-    def clear_caches(self):
-        self._steady_state_distribution = None
+        # weight the embedded chain's (cached) steady state by expected durations
+        markov_part = super(HSMMInitialState,self).steady_state_distribution
+        duration_expectations = np.array([d.mean for d in self.model.dur_distns])
+        out = markov_part * duration_expectations
+        return out / out.sum()
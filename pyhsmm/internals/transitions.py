@@ -38,9 +38,33 @@ class _HMMTransitionsBase(object):
             self._row_distns = [Multinomial(alpha_0=alpha,K=self.N,alphav_0=alphav)
                     for n in range(self.N)] # sample from prior
 
+        self.clear_caches()
+
+    ### caching
+
+    # NOTE: the row distributions replace their weights arrays (rather than
+    # writing into them) whenever they're updated, so cached matrices are keyed
+    # on the weights arrays they were built from. the cached arrays are shared
+    # by every caller (and other caches are keyed on them), so they're read-only
+
+    def clear_caches(self):
+        self._cache_weights, self._cache = None, {}
+
+    def _cached(self,name,compute):
+        weights = [d.weights for d in self._row_distns]
+        if self._cache_weights is None or len(weights) != len(self._cache_weights) \
+                or any(a is not b for a, b in zip(weights,self._cache_weights)):
+            self._cache_weights, self._cache = weights, {}
+        if name not in self._cache:
+            out = compute()
+            out.flags.writeable = False
+            self._cache[name] = out
+        return self._cache[name]
+
     @property
     def trans_matrix(self):
-        return np.array([d.weights for d in self._row_distns])
+        return self._cached(
+            'weights', lambda: np.array([d.weights for d in self._row_distns]))
 
     @trans_matrix.setter
     def trans_matrix(self,trans_matrix):
@@ -48,6 +72,14 @@ class _HMMTransitionsBase(object):
         self._row_distns = \
                 [Multinomial(alpha_0=self.alpha,K=N,alphav_0=self.alphav,weights=row)
                         for row in trans_matrix]
+        self.clear_caches()
+
+    @property
+    def log_trans_matrix(self):
+        def log_trans_matrix():
+            with np.errstate(divide='ignore'):
+                return np.log(self.trans_matrix)
+        return self._cached('log_trans_matrix',log_trans_matrix)
 
     @property
     def alpha(self):
@@ -74,7 +106,17 @@ class _HMMTransitionsBase(object):
 
     def copy_sample(self):
         new = copy.copy(self)
-        new._row_distns = [distn.copy_sample() for distn in self._row_distns]
+        new._row_distns = [self._copy_row_distn(distn) for distn in self._row_distns]
+        new.clear_caches()
+        return new
+
+    @staticmethod
+    def _copy_row_distn(distn):
+        # NOTE: row distributions replace their parameter arrays instead of
+        # writing into them, so only the sampled weights need their own copy and
+        # the hyperparameter arrays can be shared between samples
+        new = copy.copy(distn)
+        new.weights = distn.weights.copy()
         return new
 
 class _HMMTransitionsGibbs(_HMMTransitionsBase):
@@ -183,13 +225,15 @@ class HMMTransitionsConc(_ConcentrationResamplingMixin,_HMMTransitionsGibbs):
 
 class _HSMMTransitionsBase(_HMMTransitionsBase):
     def _get_trans_matrix(self):
-        out = self.full_trans_matrix
-        out.flat[::out.shape[0]+1] = 0
-        errs = np.seterr(invalid='ignore')
-        out /= out.sum(1)[:,na]
-        out = np.nan_to_num(out)
-        np.seterr(**errs)
-        return out
+        def trans_matrix():
+            out = self.full_trans_matrix.copy()
+            out.flat[::out.shape[0]+1] = 0
+            errs = np.seterr(invalid='ignore')
+            out /= out.sum(1)[:,na]
+            out = np.nan_to_num(out)
+            np.seterr(**errs)
+            return out
+        return self._cached('trans_matrix',trans_matrix)
 
     trans_matrix = property(_get_trans_matrix,_HMMTransitionsBase.trans_matrix.fset)
 
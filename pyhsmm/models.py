@@ -1,26 +1,29 @@
 from __future__ import division
 from future.utils import iteritems, itervalues
-from builtins import map, zip
+from builtins import zip
 
 import numpy as np
-import itertools
 import collections
-import operator
 import copy
 import matplotlib.pyplot as plt
 from matplotlib.gridspec import GridSpec, GridSpecFromSubplotSpec
 from matplotlib import cm
 from warnings import warn
+import scipy.linalg
 from scipy.special import logsumexp
 
 from pyhsmm.basic.abstractions import Model, ModelGibbsSampling, \
     ModelEM, ModelMAPEM, ModelMeanField, ModelMeanFieldSVI, ModelParallelTempering
 from pyhsmm.internals import hmm_states, hsmm_states, hsmm_inb_states, \
     initial_state, transitions
-from pyhsmm.util.general import list_split
+from pyhsmm.util.general import list_split, state_stats
 from pyhsmm.util.profiling import line_profiled
 from pybasicbayes.util.stats import atleast_2d
 from pybasicbayes.distributions.gaussian import Gaussian
+try:
+    import numexpr as ne
+except ImportError:
+    ne = None
 
 
 ################
@@ -97,6 +100,43 @@ class _HMMBase(Model):
 
         return s.data
 
+    _batched_obs_max_elements = 2**21  # cap on the whitened temporary's size
+
+    def _batched_obs_loglik(self,data):
+        '''
+        evaluates every obs_distn's log likelihood on data at once when they're
+        all Gaussians, returning a (T,K) matrix, or None if it can't be batched
+        '''
+        obs_distns = self.obs_distns
+        if data is None or data.ndim != 2 or not all(
+                type(o).log_likelihood is Gaussian.log_likelihood for o in obs_distns):
+            return None
+        (T, D), K = data.shape, len(obs_distns)
+        if any(o.mu is None or o.mu.shape != (D,) for o in obs_distns):
+            return None
+
+        try:
+            chols = [o.sigma_chol for o in obs_distns]
+        except np.linalg.LinAlgError:
+            return None  # let the degenerate distributions handle themselves
+        Linvs = np.array([scipy.linalg.solve_triangular(L,np.eye(D),lower=True)
+                          for L in chols])
+        Linv_mus = np.einsum('kde,ke->kd',Linvs,np.array([o.mu for o in obs_distns]))
+
+        # whiten the data under all K covariances with one matrix product per
+        # chunk of rows, so the (rows,K,D) temporary stays bounded for large T
+        Linvs_flat = Linvs.reshape(K*D,D).T
+        rows = max(1, self._batched_obs_max_elements // (K*D))
+        out = np.empty((T,K))
+        for start in range(0,T,rows):
+            xs = np.nan_to_num(data[start:start+rows]).dot(Linvs_flat).reshape(-1,K,D)
+            xs -= Linv_mus
+            out[start:start+rows] = -1./2 * np.einsum('tkd,tkd->tk',xs,xs)
+        out -= D/2.*np.log(2*np.pi) \
+            + np.array([np.log(L.diagonal()).sum() for L in chols])
+        out[np.isnan(data).any(1)] = 0.
+        return out
+
     def log_likelihood(self,data=None,**kwargs):
         if data is not None:
             if isinstance(data,np.ndarray):
@@ -126,32 +166,18 @@ class _HMMBase(Model):
         s = self.states_list.pop()
         alphal = s.messages_forwards_log()
 
-        cmaxes = alphal.max(axis=1)
-        scaled_alphal = np.exp(alphal - cmaxes[:,None])
-
         if not num_procs:
-            prev_k = 0
-            outs = []
-            for k in forecast_horizons:
-                step = k - prev_k
-                cmaxes = cmaxes[:-step]
-                scaled_alphal = scaled_alphal[:-step].dot(np.linalg.matrix_power(s.trans_matrix,step))
-
-                future_likelihoods = logsumexp(
-                    np.log(scaled_alphal) + cmaxes[:,None] + s.aBl[k:],axis=1)
-                past_likelihoods = logsumexp(alphal[:-k],axis=1)
-                outs.append(future_likelihoods - past_likelihoods)
-
-                prev_k = k
+            outs = self._predictive_likelihoods(
+                    alphal,s.trans_matrix,s.aBl,forecast_horizons)
         else:
             from joblib import Parallel, delayed
             from . import parallel
 
-            parallel.cmaxes = cmaxes
-            parallel.alphal = alphal
-            parallel.scaled_alphal = scaled_alphal
-            parallel.trans_matrix = s.trans_matrix
-            parallel.aBl = s.aBl
+            parallel.cmaxes, parallel.scaled_alphal, parallel.normalizers, \
+                parallel.amaxes, parallel.scaled_aBl = \
+                self._scale_predictive_messages(alphal,s.aBl)
+            parallel.trans_matrix_powers = \
+                    self._trans_matrix_powers(s.trans_matrix,forecast_horizons)
 
             outs = Parallel(n_jobs=num_procs,backend='multiprocessing')\
                     (delayed(parallel._get_predictive_likelihoods)(k)
@@ -159,6 +185,88 @@ class _HMMBase(Model):
 
         return outs
 
+    def block_predictive_likelihoods(self,test_data,blocklens,**kwargs):
+        '''
+        for each k in blocklens, returns an array whose entry t is
+        log p(y_{t+1:t+k} | y_{0:t}), the log likelihood of the next k
+        observations given everything up to and including time t
+        '''
+        assert all(k > 0 for k in blocklens)
+        self.add_data(data=test_data,**kwargs)
+        s = self.states_list.pop()
+        alphal = s.messages_forwards_log()
+
+        # each block likelihood is a difference of prefix normalizers, so
+        # reduce the forward messages once and share that across all blocks
+        with np.errstate(under='ignore'):
+            normalizers = logsumexp(alphal,axis=1)
+        return [normalizers[k:] - normalizers[:-k] for k in blocklens]
+
+    @staticmethod
+    def _exp_shifted(arr,shifts):
+        'computes exp(arr - shifts[:,None]), with numexpr if it is available'
+        shifts = shifts[:,None]
+        if ne is not None:
+            return ne.evaluate('exp(arr - shifts)')
+        return np.exp(arr - shifts)
+
+    @classmethod
+    def _scale_predictive_messages(cls,alphal,aBl):
+        # pull the per-row maxes out of the forward messages and the
+        # likelihoods once so every horizon can work in the linear domain
+        with np.errstate(under='ignore'):
+            cmaxes = alphal.max(axis=1)
+            scaled_alphal = cls._exp_shifted(alphal,cmaxes)
+            normalizers = cmaxes + np.log(scaled_alphal.sum(1))
+
+            amaxes = aBl.max(axis=1)
+            amaxes[~np.isfinite(amaxes)] = 0.
+            scaled_aBl = cls._exp_shifted(aBl,amaxes)
+
+        return cmaxes, scaled_alphal, normalizers, amaxes, scaled_aBl
+
+    @staticmethod
+    def _trans_matrix_powers(trans_matrix,forecast_horizons):
+        '''
+        returns a dict mapping each k in forecast_horizons to trans_matrix^k,
+        using one eigendecomposition when that is accurate enough and otherwise
+        chaining exact matrix powers over the sorted horizons
+        '''
+        horizons = sorted(set(forecast_horizons))
+
+        # NOTE: the eigendecomposition's round-off is about eps * cond(V) in
+        # absolute terms, which swamps small transition probabilities and leaks
+        # mass into structural zeros (e.g. the HSMMIntNegBin embeddings), so it
+        # is only used when every entry of every power stays well above that
+        try:
+            w, V = np.linalg.eig(trans_matrix)
+            if np.linalg.cond(V) * np.finfo(float).eps > 1e-6 * trans_matrix.min():
+                raise np.linalg.LinAlgError('eigendecomposition too inexact')
+            Vinv = np.linalg.inv(V)
+        except np.linalg.LinAlgError:
+            powers, prev_k, Pk = {}, 0, np.eye(trans_matrix.shape[0])
+            for k in horizons:
+                Pk = powers[k] = Pk.dot(np.linalg.matrix_power(trans_matrix,k-prev_k))
+                prev_k = k
+            return powers
+        return dict((k, np.maximum((V * w**k).dot(Vinv).real,0.)) for k in horizons)
+
+    @classmethod
+    def _predictive_likelihoods(cls,alphal,trans_matrix,aBl,forecast_horizons):
+        cmaxes, scaled_alphal, normalizers, amaxes, scaled_aBl = \
+                cls._scale_predictive_messages(alphal,aBl)
+        powers = cls._trans_matrix_powers(trans_matrix,forecast_horizons)
+
+        outs = {}
+        for k, Pk in iteritems(powers):
+            with np.errstate(divide='ignore'):
+                future_likelihoods = np.log(np.einsum('ij,ij->i',
+                    scaled_alphal[:-k].dot(Pk),scaled_aBl[k:])) \
+                        + cmaxes[:-k] + amaxes[k:]
+            outs[k] = future_likelihoods - normalizers[:-k]
+
+        return [outs[k] for k in forecast_horizons]
+
     @property
     def stateseqs(self):
         return [s.stateseq for s in self.states_list]
@@ -181,19 +289,23 @@ class _HMMBase(Model):
 
     @property
     def num_parameters(self):
-        return sum(o.num_parameters() for o in self.obs_distns) \
+        if self._num_parameters is None:
+            self._num_parameters = self._count_parameters()
+        return self._num_parameters
+
+    def _count_parameters(self):
+        return sum(o.num_parameters for o in self.obs_distns) \
                 + self.num_states**2 - self.num_states
 
     @property
     def used_states(self):
         'a list of the used states in the order they appear'
-        c = itertools.count()
-        canonical_ids = collections.defaultdict(lambda: next(c))
-        for s in self.states_list:
-            for state in s.stateseq:
-                canonical_ids[state]
-        return list(map(operator.itemgetter(0),
-                sorted(canonical_ids.items(),key=operator.itemgetter(1))))
+        if len(self.states_list) == 0:
+            return []
+        _, present, first_index = \
+            state_stats(np.concatenate(self.stateseqs),self.num_states)
+        used = np.flatnonzero(present)
+        return list(used[np.argsort(first_index[used])])
 
     @property
     def state_usages(self):
@@ -227,9 +339,15 @@ class _HMMBase(Model):
     ### caching
 
     def _clear_caches(self):
+        self._num_parameters = None
+        self._colors_cache = {}
+        self._clear_trans_caches()
         for s in self.states_list:
             s.clear_caches()
 
+    def _clear_trans_caches(self):
+        self.trans_distn.clear_caches()
+
     def __getstate__(self):
         self._clear_caches()
         return self.__dict__.copy()
@@ -307,7 +425,7 @@ class _HMMBase(Model):
         artists = []
         for s, data in zip(self.states_list,self.datas):
             data = data[plot_slice]
-            colorseq = [state_colors[state] for state in s.stateseq[plot_slice]]
+            colorseq = self._state_colorseq(state_colors,s.stateseq[plot_slice])
 
             if update and hasattr(s,'_data_scatter'):
                 s._data_scatter.set_offsets(data[:,:2])
@@ -346,9 +464,24 @@ class _HMMBase(Model):
 
         return artists
 
+    @staticmethod
+    def _state_colorseq(state_colors,stateseq):
+        'maps stateseq through state_colors with one lookup per distinct state'
+        states, inverse = np.unique(stateseq,return_inverse=True)
+        return np.array([state_colors[state] for state in states])[inverse]
+
     def _get_colors(self,color=None,scalars=False,color_method=None):
         color_method = color_method if color_method else 'usage'
         if color is None:
+            # NOTE: plot() asks for the same colors once per subplot, so memoize
+            # them on the stateseqs they were computed from
+            stateseqs = self.stateseqs
+            key = (scalars, color_method)
+            cache = self._colors_cache
+            if key in cache and len(cache[key][0]) == len(stateseqs) \
+                    and all(a is b for a, b in zip(cache[key][0],stateseqs)):
+                return cache[key][1]
+
             cmap = cm.get_cmap()
 
             if color_method == 'usage':
@@ -359,7 +492,7 @@ class _HMMBase(Model):
             else:
                 raise ValueError("color_method must be 'usage' or 'order'")
 
-            unused_states = [idx for idx in range(self.num_states) if idx not in used_states]
+            unused_states = np.setdiff1d(np.arange(self.num_states),used_states)
 
             colorseq = np.random.RandomState(0).permutation(np.linspace(0,1,self.num_states))
             colors = dict((idx, v if scalars else cmap(v)) for idx, v in zip(used_states,colorseq))
@@ -367,6 +500,7 @@ class _HMMBase(Model):
             for state in unused_states:
                 colors[state] = cmap(1.)
 
+            cache[key] = (stateseqs, colors)
             return colors
         elif isinstance(color,dict):
             return color
@@ -404,7 +538,7 @@ class _HMMBase(Model):
         datamin, datamax = data.min(), data.max()
 
         x, y = np.hstack((0,durations.cumsum())), np.array([datamin,datamax])
-        C = np.atleast_2d([state_colors[state] for state in stateseq_norep])
+        C = np.atleast_2d(self._state_colorseq(state_colors,stateseq_norep))
 
         s._pcolor_im = ax.pcolormesh(x,y,C,vmin=0,vmax=1,alpha=0.3)
         ax.set_ylim((datamin,datamax))
@@ -418,7 +552,7 @@ class _HMMBase(Model):
         data = s.data[plot_slice]
         stateseq = s.stateseq[plot_slice]
 
-        colorseq = np.tile(np.array([state_colors[state] for state in stateseq[:-1]]),data.shape[1])
+        colorseq = np.tile(self._state_colorseq(state_colors,stateseq[:-1]),data.shape[1])
 
         if update and hasattr(s,'_data_lc'):
             s._data_lc.set_array(colorseq)
@@ -437,21 +571,53 @@ class _HMMBase(Model):
 
 class _HMMGibbsSampling(_HMMBase,ModelGibbsSampling):
     @line_profiled
-    def resample_model(self,num_procs=0):
-        self.resample_parameters()
-        self.resample_states(num_procs=num_procs)
+    def resample_model(self,num_procs=0,num_threads=0):
+        self.resample_parameters(num_threads=num_threads)
+        self.resample_states(num_procs=num_procs,num_threads=num_threads)
 
     @line_profiled
-    def resample_parameters(self):
-        self.resample_obs_distns()
+    def resample_parameters(self,num_threads=0):
+        self.resample_obs_distns(num_threads=num_threads)
         self.resample_trans_distn()
         self.resample_init_state_distn()
 
-    def resample_obs_distns(self):
-        for state, distn in enumerate(self.obs_distns):
-            distn.resample([s.data[s.stateseq == state] for s in self.states_list])
+    def resample_obs_distns(self,num_threads=0):
+        data, offsets = self._obs_buckets()
+        def resample(state,distn):
+            distn.resample(data[offsets[state]:offsets[state+1]])
+        self._resample_each_state(resample,self.obs_distns,num_threads)
         self._clear_caches()
 
+    _min_states_for_threads = 8  # fewer than this isn't worth starting threads
+
+    def _resample_each_state(self,resample,distns,num_threads=0):
+        # NOTE: the per-state updates are independent and mostly numpy/LAPACK
+        # work that releases the GIL, so they can share the model in threads.
+        # the threads all draw from the global np.random in whatever order they
+        # get scheduled, so seeded runs are only reproducible with num_threads=0
+        if num_threads > 0 and len(distns) >= self._min_states_for_threads:
+            from joblib import Parallel, delayed
+            Parallel(n_jobs=num_threads,backend='threading')\
+                    (delayed(resample)(state,distn) for state, distn in enumerate(distns))
+        else:
+            for state, distn in enumerate(distns):
+                resample(state,distn)
+
+    def _obs_buckets(self):
+        '''
+        returns the data from every sequence concatenated and sorted by state,
+        along with offsets delimiting each state's contiguous block
+        '''
+        if len(self.states_list) == 0:
+            return [], np.zeros(self.num_states+1,dtype=np.int64)
+        elif len(self.states_list) == 1:
+            return self.states_list[0].state_buckets
+        else:
+            return hmm_states._bucket_by_state(
+                np.concatenate([s.stateseq for s in self.states_list]),
+                np.concatenate([s.data for s in self.states_list]),
+                self.num_states)
+
     @line_profiled
     def resample_trans_distn(self):
         self.trans_distn.resample([s.stateseq for s in self.states_list])
@@ -461,12 +627,17 @@ class _HMMGibbsSampling(_HMMBase,ModelGibbsSampling):
         self.init_state_distn.resample([s.stateseq[0] for s in self.states_list])
         self._clear_caches()
 
-    def resample_states(self,num_procs=0):
-        if num_procs == 0:
+    def resample_states(self,num_procs=0,num_threads=0):
+        # NOTE: with num_threads > 0 every sequence draws from the shared global
+        # np.random in whatever order the threads get scheduled, so seeded runs
+        # are not reproducible; use num_threads=0 when that matters
+        if num_procs > 0:
+            self._joblib_resample_states(self.states_list,num_procs)
+        elif num_threads > 0 and self._states_class._releases_gil:
+            self._joblib_resample_states_threaded(self.states_list,num_threads)
+        else:
             for s in self.states_list:
                 s.resample()
-        else:
-            self._joblib_resample_states(self.states_list,num_procs)
 
     def copy_sample(self):
         new = copy.copy(self)
@@ -504,6 +675,16 @@ class _HMMGibbsSampling(_HMMBase,ModelGibbsSampling):
     def _get_joblib_pair(self,states_obj):
         return (states_obj.data,states_obj._kwargs)
 
+    def _joblib_resample_states_threaded(self,states_list,num_threads):
+        from joblib import Parallel, delayed
+
+        # NOTE: the Eigen message passing code runs without the GIL, so the
+        # sequences can be resampled in threads that share this model in place
+        # instead of pickling it out to worker processes. the draws interleave
+        # on the global np.random, so results depend on thread scheduling
+        Parallel(n_jobs=num_threads,backend='threading')\
+                (delayed(s.resample)() for s in states_list)
+
 
 class _HMMMeanField(_HMMBase,ModelMeanField):
     def meanfield_coordinate_descent_step(self,compute_vlb=True,num_procs=0):
@@ -638,6 +819,13 @@ class _HMMEM(_HMMBase,ModelEM):
         self._clear_caches()
         self._E_step()
         self._M_step()
+        self._clear_states_caches()
+
+    def _clear_states_caches(self):
+        # NOTE: after an M step the states objects still hold likelihoods and
+        # normalizers from the old parameters, but the parameter count is as is
+        for s in self.states_list:
+            s.clear_caches()
 
     def _E_step(self):
         for s in self.states_list:
@@ -669,13 +857,14 @@ class _HMMEM(_HMMBase,ModelEM):
         # NOTE: in principle this method computes the BIC only after finding the
         # maximum likelihood parameters (or, of course, an EM fixed-point as an
         # approximation!)
-        assert data is None and len(self.states_list) > 0, 'Must have data to get BIC'
+        assert data is not None or len(self.states_list) > 0, 'Must have data to get BIC'
         if data is None:
-            return -2*sum(self.log_likelihood(s.data).sum() for s in self.states_list) + \
-                        self.num_parameters() * np.log(
-                                sum(s.data.shape[0] for s in self.states_list))
+            # NOTE: the states objects cache their normalizers, so this doesn't
+            # rerun message passing unless the parameters changed
+            return -2*self.log_likelihood() + self.num_parameters * np.log(
+                    sum(s.data.shape[0] for s in self.states_list))
         else:
-            return -2*self.log_likelihood(data) + self.num_parameters() * np.log(data.shape[0])
+            return -2*self.log_likelihood(data) + self.num_parameters * np.log(data.shape[0])
 
 
 class _HMMViterbiEM(_HMMBase,ModelMAPEM):
@@ -698,8 +887,10 @@ class _HMMViterbiEM(_HMMBase,ModelMAPEM):
         self._Viterbi_M_step_trans_distn()
 
     def _Viterbi_M_step_obs_distns(self):
+        buckets = [s.state_buckets for s in self.states_list]
         for state, distn in enumerate(self.obs_distns):
-            distn.max_likelihood([s.data[s.stateseq == state] for s in self.states_list])
+            distn.max_likelihood([data[offsets[state]:offsets[state+1]]
+                for data, offsets in buckets])
 
     def _Viterbi_M_step_init_state_distn(self):
         self.init_state_distn.max_likelihood(
@@ -833,6 +1024,10 @@ class HMM(HMMPython):
     _states_class = hmm_states.HMMStatesEigen
 
 
+class HMMNumba(HMMPython):
+    _states_class = hmm_states.HMMStatesNumba
+
+
 class WeakLimitHDPHMMPython(_WeakLimitHDPMixin,HMMPython):
     # NOTE: shouldn't really inherit EM or ViterbiEM, but it's convenient!
     _trans_class = transitions.WeakLimitHDPHMMTransitions
@@ -860,20 +1055,24 @@ class WeakLimitStickyHDPHMM(WeakLimitHDPHMM):
     def __init__(self,obs_distns,
             kappa=None,alpha=None,gamma=None,trans_matrix=None,
             alpha_a_0=None,alpha_b_0=None,gamma_a_0=None,gamma_b_0=None,
-            **kwargs):
-        assert (None not in (alpha,gamma)) ^ \
-                (None not in (alpha_a_0,alpha_b_0,gamma_a_0,gamma_b_0))
-        if None not in (alpha,gamma):
-            trans_distn = transitions.WeakLimitStickyHDPHMMTransitions(
-                    num_states=len(obs_distns),
-                    kappa=kappa,alpha=alpha,gamma=gamma,trans_matrix=trans_matrix)
-        else:
-            trans_distn = transitions.WeakLimitStickyHDPHMMTransitionsConc(
-                    num_states=len(obs_distns),
-                    kappa=kappa,
-                    alpha_a_0=alpha_a_0,alpha_b_0=alpha_b_0,
-                    gamma_a_0=gamma_a_0,gamma_b_0=gamma_b_0,
-                    trans_matrix=trans_matrix)
+            trans_distn=None,**kwargs):
+        provided = [trans_distn is not None,
+                    None not in (alpha,gamma),
+                    None not in (alpha_a_0,alpha_b_0,gamma_a_0,gamma_b_0)]
+        assert sum(provided) == 1, 'specify exactly one of trans_distn, ' \
+            '(alpha, gamma), or (alpha_a_0, alpha_b_0, gamma_a_0, gamma_b_0)'
+        if trans_distn is None:
+            if None not in (alpha,gamma):
+                trans_distn = transitions.WeakLimitStickyHDPHMMTransitions(
+                        num_states=len(obs_distns),
+                        kappa=kappa,alpha=alpha,gamma=gamma,trans_matrix=trans_matrix)
+            else:
+                trans_distn = transitions.WeakLimitStickyHDPHMMTransitionsConc(
+                        num_states=len(obs_distns),
+                        kappa=kappa,
+                        alpha_a_0=alpha_a_0,alpha_b_0=alpha_b_0,
+                        gamma_a_0=gamma_a_0,gamma_b_0=gamma_b_0,
+                        trans_matrix=trans_matrix)
         super(WeakLimitStickyHDPHMM,self).__init__(
                 obs_distns=obs_distns,trans_distn=trans_distn,**kwargs)
 
@@ -890,12 +1089,21 @@ class _HSMMBase(_HMMBase):
     _states_class = hsmm_states.HSMMStatesPython
     _trans_class = transitions.HSMMTransitions
     _trans_conc_class = transitions.HSMMTransitionsConc
-    # _init_steady_state_class = initial_state.HSMMSteadyState # TODO
+    _init_steady_state_class = initial_state.HSMMInitialState
 
     def __init__(self,dur_distns,**kwargs):
         self.dur_distns = dur_distns
         super(_HSMMBase,self).__init__(**kwargs)
 
+        # left-censored sequences start in the steady state, so reuse
+        # init_state_distn if it already is that rather than building another
+        if isinstance(self.init_state_distn,self._init_steady_state_class) \
+                and self.init_state_distn._is_steady_state:
+            self.left_censoring_init_state_distn = self.init_state_distn
+        else:
+            self.left_censoring_init_state_distn = \
+                self._init_steady_state_class(model=self)
+
     def add_data(self,data,stateseq=None,trunc=None,
             right_censoring=True,left_censoring=False,**kwargs):
         self.states_list.append(self._states_class(
@@ -908,10 +1116,9 @@ class _HSMMBase(_HMMBase):
             **kwargs))
         return self.states_list[-1]
 
-    @property
-    def num_parameters(self):
-        return sum(o.num_parameters() for o in self.obs_distns) \
-                + sum(d.num_parameters() for d in self.dur_distns) \
+    def _count_parameters(self):
+        return sum(o.num_parameters for o in self.obs_distns) \
+                + sum(d.num_parameters for d in self.dur_distns) \
                 + self.num_states**2 - self.num_states
 
 #     def plot_durations(self,colors=None,states_objs=None):
@@ -947,24 +1154,46 @@ class _HSMMBase(_HMMBase):
 
 class _HSMMGibbsSampling(_HSMMBase,_HMMGibbsSampling):
     @line_profiled
-    def resample_parameters(self,**kwargs):
-        self.resample_dur_distns()
-        super(_HSMMGibbsSampling,self).resample_parameters(**kwargs)
-
-    def resample_dur_distns(self):
-        for state, distn in enumerate(self.dur_distns):
+    def resample_parameters(self,num_threads=0,**kwargs):
+        self.resample_dur_distns(num_threads=num_threads)
+        super(_HSMMGibbsSampling,self).resample_parameters(
+                num_threads=num_threads,**kwargs)
+
+    def resample_dur_distns(self,num_threads=0):
+        (durs, offsets), (cdurs, coffsets) = self._dur_buckets()
+        def resample(state,distn):
             distn.resample_with_censoring_and_truncation(
-            data=
-            [s.durations_censored[s.untrunc_slice][s.stateseq_norep[s.untrunc_slice] == state]
-                for s in self.states_list],
-            censored_data=
-            [s.durations_censored[s.trunc_slice][s.stateseq_norep[s.trunc_slice] == state]
-                for s in self.states_list])
+            data=durs[offsets[state]:offsets[state+1]],
+            censored_data=cdurs[coffsets[state]:coffsets[state+1]])
+        self._resample_each_state(resample,self.dur_distns,num_threads)
         self._clear_caches()
 
+    def _dur_buckets(self):
+        '''
+        returns the uncensored and the censored durations from every sequence,
+        each concatenated and sorted by state along with per-state offsets
+        '''
+        def bucket(slices):
+            return hmm_states._bucket_by_state(
+                np.concatenate([seq[sl] for seq, sl in zip(stateseqs_norep,slices)]),
+                np.concatenate([durs[sl] for durs, sl in zip(durations,slices)]),
+                self.num_states)
+
+        if len(self.states_list) == 0:
+            empty = np.array([],dtype=np.int64), np.zeros(self.num_states+1,dtype=np.int64)
+            return empty, empty
+
+        stateseqs_norep = self.stateseqs_norep
+        durations = [s.durations_censored for s in self.states_list]
+        return bucket([s.untrunc_slice for s in self.states_list]), \
+            bucket([s.trunc_slice for s in self.states_list])
+
     def copy_sample(self):
         new = super(_HSMMGibbsSampling,self).copy_sample()
         new.dur_distns = [d.copy_sample() for d in self.dur_distns]
+        new.left_censoring_init_state_distn = new.init_state_distn \
+            if self.left_censoring_init_state_distn is self.init_state_distn \
+            else self.left_censoring_init_state_distn.copy_sample(new)
         return new
 
 
@@ -1020,6 +1249,7 @@ class _HSMMINBEMMixin(_HMMEM,ModelEM):
             distn.max_likelihood(data=None,stats=(
                 sum(s.expected_dur_ns[state] for s in self.states_list),
                 sum(s.expected_dur_tots[state] for s in self.states_list)))
+        self._clear_states_caches()
 
 
 class _HSMMViterbiEM(_HSMMBase,_HMMViterbiEM):
@@ -1028,9 +1258,9 @@ class _HSMMViterbiEM(_HSMMBase,_HMMViterbiEM):
         self._Viterbi_M_step_dur_distns()
 
     def _Viterbi_M_step_dur_distns(self):
+        durations = [(s.durations, s.state_indices_norep) for s in self.states_list]
         for state, distn in enumerate(self.dur_distns):
-            distn.max_likelihood(
-                    [s.durations[s.stateseq_norep == state] for s in self.states_list])
+            distn.max_likelihood([durs[idx[state]] for durs, idx in durations])
 
     def _Viterbi_M_step_trans_distn(self):
         self.trans_distn.max_likelihood([s.stateseq_norep for s in self.states_list])
@@ -1047,15 +1277,13 @@ class _HSMMParallelTempering(_HSMMBase,_HMMParallelTempering):
 
 
 class _DelayedMixin(object):
-    def resample_dur_distns(self):
-        for state, distn in enumerate(self.dur_distns):
+    def resample_dur_distns(self,num_threads=0):
+        (durs, offsets), (cdurs, coffsets) = self._dur_buckets()
+        def resample(state,distn):
             distn.resample_with_censoring_and_truncation(
-            data=
-            [s.durations_censored[s.untrunc_slice][s.stateseq_norep[s.untrunc_slice] == state]
-                - s.delays[state] for s in self.states_list],
-            censored_data=
-            [s.durations_censored[s.trunc_slice][s.stateseq_norep[s.trunc_slice] == state]
-                - s.delays[state] for s in self.states_list])
+            data=durs[offsets[state]:offsets[state+1]] - distn.delay,
+            censored_data=cdurs[coffsets[state]:coffsets[state+1]] - distn.delay)
+        self._resample_each_state(resample,self.dur_distns,num_threads)
         self._clear_caches()
 
 #################
@@ -1130,28 +1358,12 @@ class HSMMIntNegBin(_HSMMGibbsSampling,_HSMMMeanField,_HSMMSVI,_HSMMViterbiEM,
         return 0.  # TODO
 
     def predictive_likelihoods(self,test_data,forecast_horizons,**kwargs):
+        assert all(k > 0 for k in forecast_horizons)
         self.add_data(data=test_data,**kwargs)
         s = self.states_list.pop()
         alphal = s.hmm_messages_forwards_log()
-
-        cmaxes = alphal.max(axis=1)
-        scaled_alphal = np.exp(alphal - cmaxes[:,None])
-
-        prev_k = 0
-        outs = []
-        for k in forecast_horizons:
-            step = k - prev_k
-            cmaxes = cmaxes[:-step]
-            scaled_alphal = scaled_alphal[:-step].dot(np.linalg.matrix_power(s.hmm_trans_matrix,step))
-
-            future_likelihoods = logsumexp(
-                    np.log(scaled_alphal) + cmaxes[:,None] + s.hmm_aBl[k:],axis=1)
-            past_likelihoods = logsumexp(alphal[:-k],axis=1)
-            outs.append(future_likelihoods - past_likelihoods)
-
-            prev_k = k
-
-        return outs
+        return self._predictive_likelihoods(
+                alphal,s.hmm_trans_matrix,s.hmm_aBl,forecast_horizons)
 
 
 class WeakLimitHDPHSMMIntNegBin(_WeakLimitHDPMixin,HSMMIntNegBin):
@@ -1204,22 +1416,20 @@ class WeakLimitHDPHSMMTruncatedIntNegBin(_WeakLimitHDPMixin,HSMMIntNegBin):
             d.delay = delay
         super(WeakLimitHDPHSMMTruncatedIntNegBin,self).__init__(dur_distns=dur_distns,**kwargs)
 
-    def resample_dur_distns(self):
-        for state, distn in enumerate(self.dur_distns):
+    def resample_dur_distns(self,num_threads=0):
+        (durs, offsets), (cdurs, coffsets) = self._dur_buckets()
+        def resample(state,distn):
             distn.resample_with_censoring_and_truncation(
                 # regular data
-                data =
-                [s.durations_censored[s.untrunc_slice][s.stateseq_norep[s.untrunc_slice] == state]
-                    for s in self.states_list],
+                data = durs[offsets[state]:offsets[state+1]],
 
                 # right censoring due to HSMM states
-                censored_data =
-                [s.durations_censored[s.trunc_slice][s.stateseq_norep[s.trunc_slice] == state]
-                    for s in self.states_list],
+                censored_data = cdurs[coffsets[state]:coffsets[state+1]],
 
                 # left truncation level
                 left_truncation_level = distn.delay,
                 )
+        self._resample_each_state(resample,self.dur_distns,num_threads)
         self._clear_caches()
 
 ##########
@@ -1256,6 +1466,13 @@ class _SeparateTransMixin(object):
         self.trans_distns.update(dct['trans_distns'])
         self.init_state_distns.update(dct['init_state_distns'])
 
+    def _clear_trans_caches(self):
+        # NOTE: trans_distn only exists until __init__ swaps in trans_distns
+        if hasattr(self,'trans_distn'):
+            return super(_SeparateTransMixin,self)._clear_trans_caches()
+        for trans_distn in itervalues(self.trans_distns):
+            trans_distn.clear_caches()
+
     ### parallel tempering
 
     def swap_sample_with(self,other):
@@ -1377,15 +1594,13 @@ class WeakLimitHDPHSMMDelayedIntNegBinSeparateTrans(
     _states_class = hsmm_inb_states.HSMMStatesDelayedIntegerNegativeBinomialSeparateTrans
 
     # TODO is this method needed?
-    def resample_dur_distns(self):
-        for state, distn in enumerate(self.dur_distns):
+    def resample_dur_distns(self,num_threads=0):
+        (durs, offsets), (cdurs, coffsets) = self._dur_buckets()
+        def resample(state,distn):
             distn.resample_with_censoring_and_truncation(
-            data=
-            [s.durations_censored[s.untrunc_slice][s.stateseq_norep[s.untrunc_slice] == state]
-                - s.delays[state] for s in self.states_list],
-            censored_data=
-            [s.durations_censored[s.trunc_slice][s.stateseq_norep[s.trunc_slice] == state]
-                - s.delays[state] for s in self.states_list])
+            data=durs[offsets[state]:offsets[state+1]] - distn.delay,
+            censored_data=cdurs[coffsets[state]:coffsets[state+1]] - distn.delay)
+        self._resample_each_state(resample,self.dur_distns,num_threads)
         self._clear_caches()
 
 
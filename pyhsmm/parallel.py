@@ -1,6 +1,5 @@
 from __future__ import division
 import numpy as np
-from scipy.special import logsumexp
 
 # NOTE: pass arguments through global variables instead of arguments to exploit
 # the fact that they're read-only and multiprocessing/joblib uses fork
@@ -58,15 +57,17 @@ def _get_sampled_stateseq_and_labels(idx):
 
 
 cmaxes = None
-alphal = None
 scaled_alphal = None
-trans_matrix = None
-aBl = None
+normalizers = None
+amaxes = None
+scaled_aBl = None
+trans_matrix_powers = None
 def _get_predictive_likelihoods(k):
-    future_likelihoods = logsumexp(
-            np.log(scaled_alphal[:-k].dot(np.linalg.matrix_power(trans_matrix,k))) \
-                    + cmaxes[:-k,None] + aBl[k:], axis=1)
-    past_likelihoods = logsumexp(alphal[:-k], axis=1)
+    with np.errstate(divide='ignore'):
+        future_likelihoods = np.log(np.einsum('ij,ij->i',
+            scaled_alphal[:-k].dot(trans_matrix_powers[k]),
+            scaled_aBl[k:])) + cmaxes[:-k] + amaxes[k:]
+    past_likelihoods = normalizers[:-k]
 
     return future_likelihoods - past_likelihoods
 
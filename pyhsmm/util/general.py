@@ -210,6 +210,18 @@ def count_transitions(stateseq,minlength=None):
         out[a,b] += 1
     return out
 
+def state_stats(stateseq,num_states):
+    '''
+    returns (counts, present, first_index) for the labels in stateseq, where
+    first_index[k] is where state k first appears (or -1 if it doesn't)
+    '''
+    counts = np.bincount(stateseq,minlength=num_states)
+    present = counts > 0
+    first_index = np.repeat(-1,num_states)
+    states, idx = np.unique(stateseq,return_index=True)
+    first_index[states] = idx
+    return counts, present, first_index
+
 ### SGD
 
 def sgd_steps(tau,kappa):
@@ -115,6 +115,7 @@ setup(name='pyhsmm',
                 'variational inference', 'mean field', 'vb'],
       install_requires=[
           "numpy", "scipy", "matplotlib", "nose", "pybasicbayes >= 0.1.3", "future", "six"],
+      extras_require={"numba": ["numba"], "numexpr": ["numexpr"]},
       setup_requires=['numpy', "future", "six"],
       ext_modules=ext_modules,
       classifiers=[
@@ -13,8 +13,16 @@ from pyhsmm import models as m, distributions as d
 #  util  #
 ##########
 
+# NOTE: numba is an optional extra, so only check HMMNumba when it's installed
+try:
+    import numba
+except ImportError:
+    hmm_classes = [m.HMMPython, m.HMM]
+else:
+    hmm_classes = [m.HMMPython, m.HMMNumba, m.HMM]
+
 def likelihood_check(obs_distns,trans_matrix,init_distn,data,target_val):
-    for cls in [m.HMMPython, m.HMM]:
+    for cls in hmm_classes:
         hmm = cls(alpha=6.,init_state_concentration=1, # placeholders
                 obs_distns=obs_distns)
         hmm.trans_distn.trans_matrix = trans_matrix
@@ -148,3 +156,102 @@ def gaussian_exhaustive_test():
     data = np.vstack([obs_distns[a].rvs() for a in stateseq])
     target_val = compute_likelihood_enumeration(obs_distns=obs_distns,data=data,**model)
     likelihood_check(target_val=target_val,data=data,obs_distns=obs_distns,**model)
+
+@attr('hmm','likelihood','predictive')
+@runmultiple(3)
+def predictive_likelihoods_test():
+    model = random_model(3)
+    obs_distns = [d.Categorical(K=3,alpha_0=1.) for _ in range(3)]
+    stateseq = np.random.randint(3,size=10)
+    data = np.array([obs_distns[a].rvs() for a in stateseq])
+    target_val = compute_likelihood_enumeration(obs_distns=obs_distns,data=data,**model)
+
+    hmm = m.HMMPython(alpha=6.,init_state_concentration=1, # placeholders
+            obs_distns=obs_distns)
+    hmm.trans_distn.trans_matrix = model['trans_matrix']
+    hmm.init_state_distn.weights = model['init_distn']
+
+    # one-step predictive likelihoods chain together into the full likelihood
+    first_likes = np.array([o.log_likelihood(data[:1])[0] for o in obs_distns])
+    first_val = np.log(model['init_distn'].dot(np.exp(first_likes)))
+    one_step, = hmm.predictive_likelihoods(data,[1])
+    assert np.isclose(target_val, first_val + one_step.sum())
+
+    # horizons can be requested in any order
+    out3, out1 = hmm.predictive_likelihoods(data,[3,1])
+    assert np.allclose(out1, one_step)
+    assert np.allclose(out3, hmm.predictive_likelihoods(data,[1,3])[1])
+
+@attr('hmm','likelihood','predictive')
+def block_predictive_likelihoods_test():
+    model = random_model(3)
+    obs_distns = [d.Categorical(K=3,alpha_0=1.) for _ in range(3)]
+    stateseq = np.random.randint(3,size=10)
+    data = np.array([obs_distns[a].rvs() for a in stateseq])
+    target_val = compute_likelihood_enumeration(obs_distns=obs_distns,data=data,**model)
+
+    hmm = m.HMMPython(alpha=6.,init_state_concentration=1, # placeholders
+            obs_distns=obs_distns)
+    hmm.trans_distn.trans_matrix = model['trans_matrix']
+    hmm.init_state_distn.weights = model['init_distn']
+
+    # length-one blocks are the one-step predictive likelihoods
+    block1, = hmm.block_predictive_likelihoods(data,[1])
+    assert np.allclose(block1, hmm.predictive_likelihoods(data,[1])[0])
+
+    # a block covering everything after the first step telescopes to the full
+    # likelihood once the first observation's term is added back
+    first_likes = np.array([o.log_likelihood(data[:1])[0] for o in obs_distns])
+    first_val = np.log(model['init_distn'].dot(np.exp(first_likes)))
+    whole, = hmm.block_predictive_likelihoods(data,[len(data)-1])
+    assert whole.shape == (1,)
+    assert np.isclose(target_val, first_val + whole[0])
+
+@attr('hsmm','likelihood','predictive')
+def intnegbin_predictive_likelihoods_test():
+    from pyhsmm.internals.hmm_states import HMMStatesPython
+    from scipy.special import logsumexp
+
+    # sticky durations make the embedded transition matrix mostly structural
+    # zeros, where inexact matrix powers badly overstate switching probabilities
+    obs_distns = [d.Gaussian(mu=np.array([10.*i]),sigma=np.eye(1)) for i in range(3)]
+    dur_distns = [d.NegativeBinomialIntegerRDuration(r=r,p=0.99) for r in (5,8,6)]
+    hsmm = m.HSMMIntNegBin(alpha=6.,init_state_concentration=1., # placeholders
+            obs_distns=obs_distns,dur_distns=dur_distns)
+    stateseq = np.array([0,1,2,0,2,1,0,1,2,1])
+    data = 10.*stateseq[:,na] + np.random.randn(len(stateseq),1)
+
+    hsmm.add_data(data)
+    s = hsmm.states_list.pop()
+    A, aBl = s.hmm_trans_matrix, s.hmm_aBl
+    assert (A == 0).any()
+    alphal = HMMStatesPython._messages_forwards_log(A,s.hmm_pi_0,aBl)
+
+    horizons = [1,2,5]
+    for k, out in zip(horizons, hsmm.predictive_likelihoods(data,horizons)):
+        with np.errstate(divide='ignore'):
+            logAk = np.log(np.linalg.matrix_power(A,k))
+        target = logsumexp(alphal[:-k,:,na] + logAk + aBl[k:,na,:],axis=(1,2)) \
+                - logsumexp(alphal[:-k],axis=1)
+        assert np.allclose(out, target)
+
+@attr('hmm','likelihood','EM')
+def BIC_test():
+    nstates, D, T = 3, 2, 100
+    obs_distns = [d.Gaussian(mu=np.random.randn(D),sigma=np.eye(D))
+            for _ in range(nstates)]
+    hmm = m.HMMPython(alpha=6.,init_state_concentration=1., # placeholders
+            obs_distns=obs_distns)
+    hmm.add_data(np.random.randn(T,D))
+    for itr in range(3):
+        hmm.EM_step()
+
+    # BIC has to see the likelihood under the parameters from the last M step,
+    # and repeated calls reuse the cached pieces
+    bic = hmm.BIC()
+    assert hmm._num_parameters is not None
+    assert np.isclose(bic, hmm.BIC())
+    for s in hmm.states_list:
+        s.clear_caches()
+    num_parameters = sum(o.num_parameters for o in obs_distns) + nstates**2 - nstates
+    assert np.isclose(bic, -2*hmm.log_likelihood() + num_parameters*np.log(T))
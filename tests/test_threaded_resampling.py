@@ -0,0 +1,70 @@
+from __future__ import division
+from builtins import range
+import numpy as np
+from nose.plugins.attrib import attr
+
+from pyhsmm import models as m, distributions as d
+
+# NOTE: threaded draws interleave on the global np.random, so these are only
+# smoke tests that the threaded paths run and leave the model consistent
+
+def _gaussians(nstates):
+    return [d.Gaussian(mu_0=np.zeros(2),sigma_0=np.eye(2),kappa_0=0.25,nu_0=4)
+            for _ in range(nstates)]
+
+@attr('hmm','threads')
+def hmm_threaded_resample_test():
+    nstates = 8
+    hmm = m.HMMPython(alpha=6.,init_state_concentration=1.,
+            obs_distns=_gaussians(nstates))
+    assert nstates >= hmm._min_states_for_threads
+    for _ in range(2):
+        hmm.add_data(np.random.randn(100,2))
+
+    for itr in range(3):
+        hmm.resample_model(num_threads=2)
+        assert np.isfinite(hmm.log_likelihood())
+        assert all(s.stateseq.shape == (100,) for s in hmm.states_list)
+
+@attr('hsmm','threads')
+def hsmm_threaded_resample_test():
+    nstates = 8
+    hsmm = m.HSMMPython(alpha=6.,init_state_concentration=1.,
+            obs_distns=_gaussians(nstates),
+            dur_distns=[d.PoissonDuration(alpha_0=10.,beta_0=2.)
+                for _ in range(nstates)])
+    hsmm.add_data(np.random.randn(100,2))
+
+    for itr in range(3):
+        hsmm.resample_parameters(num_threads=2)
+        assert np.isfinite(hsmm.log_likelihood())
+
+@attr('hmm','threads')
+def hmm_eigen_threaded_resample_states_test():
+    nstates = 8
+    hmm = m.HMM(alpha=6.,init_state_concentration=1.,
+            obs_distns=_gaussians(nstates))
+    assert hmm._states_class._releases_gil  # so resample_states uses threads
+    for _ in range(4):
+        hmm.add_data(np.random.randn(100,2))
+
+    for itr in range(3):
+        hmm.resample_model(num_threads=2)
+        assert np.isfinite(hmm.log_likelihood())
+        assert all(s.stateseq.shape == (100,) for s in hmm.states_list)
+
+@attr('hsmm','threads')
+def hsmm_eigen_threaded_resample_states_test():
+    nstates = 8
+    hsmm = m.HSMM(alpha=6.,init_state_concentration=1.,
+            obs_distns=_gaussians(nstates),
+            dur_distns=[d.PoissonDuration(alpha_0=10.,beta_0=2.)
+                for _ in range(nstates)])
+    assert hsmm._states_class._releases_gil
+    for _ in range(4):
+        hsmm.add_data(np.random.randn(100,2))
+
+    for itr in range(3):
+        hsmm.resample_model(num_threads=2)
+        assert np.isfinite(hsmm.log_likelihood())
+        assert all(s.stateseq.shape == (100,) for s in hsmm.states_list)